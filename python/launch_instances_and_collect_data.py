@@ -11,7 +11,7 @@ from collections import OrderedDict
 from datetime import datetime, timedelta, UTC
 
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 INSTANCE_TYPE_PREFIXES_TO_MAX_VCPUS = OrderedDict()
 INSTANCE_TYPE_PREFIXES_TO_MAX_VCPUS[('dl',)] = 192
@@ -40,8 +40,56 @@ subnet_ids = [
 #     "subnet-091d9e6b2975a1569",
 # ]
 
-def get_index_in_dict(instance_type):
-    for prefixes, total_vcpus_budget in INSTANCE_TYPE_PREFIXES_TO_MAX_VCPUS.items():
+
+@dataclass
+class RegionConfig:
+    """
+    Everything the launcher needs to sweep instance types in one region.
+
+    Each region has its own vCPU quota, so budget tracking (consumed vCPUs and
+    the lock guarding them) lives on the config rather than being shared.
+    Set endpoint_url to point the EC2 client at a local stand-in.
+    """
+    region_name: str
+    subnet_ids: list
+    security_group_id: str
+    # architecture (e.g. "arm64", "x86_64") -> AMI ID valid in this region
+    image_ids: dict
+    instance_type_prefixes_to_max_vcpus: OrderedDict
+    key_name: str = "pmu-events-info-key"
+    max_workers: int = 1
+    endpoint_url: str | None = None
+    instance_id_to_budget_consumed: dict = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# The original single-region setup. It shares the module level quota table,
+# budget dict and lock so existing callers see the same state.
+DEFAULT_REGION_CONFIG = RegionConfig(
+    region_name="us-east-1",
+    subnet_ids=subnet_ids,
+    security_group_id="sg-0d7ddef649615c1ce",
+    image_ids={
+        "arm64": "ami-01b2110eef525172b",
+        "x86_64": "ami-0bbdd8c17ed981ef9",
+    },
+    instance_type_prefixes_to_max_vcpus=INSTANCE_TYPE_PREFIXES_TO_MAX_VCPUS,
+    instance_id_to_budget_consumed=instance_id_to_budget_consumed,
+    lock=locker_instance_type_prefixes_to_total_vcpus_budget,
+)
+
+# Add a RegionConfig per region to spread the sweep across regional quotas.
+# The terraform stack only provisions us-east-1 today, so each added region's
+# subnets, security group and key pair must be created separately (by hand or
+# a separate stack). AMI IDs are region specific:
+# aws ssm get-parameters --region <region> --names \
+#   /aws/service/canonical/ubuntu/server/24.04/stable/current/{amd64,arm64}/hvm/ebs-gp3/ami-id
+REGION_CONFIGS = [
+    DEFAULT_REGION_CONFIG,
+]
+
+def get_index_in_dict(instance_type, instance_type_prefixes_to_max_vcpus=INSTANCE_TYPE_PREFIXES_TO_MAX_VCPUS):
+    for prefixes, total_vcpus_budget in instance_type_prefixes_to_max_vcpus.items():
         if InstanceType.from_instance_type(instance_type).series in prefixes:
             return prefixes
     return ("default",)
@@ -69,12 +117,13 @@ class InstanceType:
 
 
 
-def calculate_available_budget(index_in_dict):
+def calculate_available_budget(index_in_dict, region=DEFAULT_REGION_CONFIG):
     """
     Calculate available vCPU budget for a given instance type prefix.
     
     Args:
         index_in_dict: Tuple of prefixes (e.g., ('a', 'c', 'd', ...))
+        region: RegionConfig whose quota and consumption to use
     
     Returns:
         Available vCPUs remaining for this prefix group
@@ -82,29 +131,30 @@ def calculate_available_budget(index_in_dict):
     if index_in_dict is None:
         return 10000
     
-    max_budget = INSTANCE_TYPE_PREFIXES_TO_MAX_VCPUS[index_in_dict]
+    max_budget = region.instance_type_prefixes_to_max_vcpus[index_in_dict]
     
     # Calculate currently consumed budget from active instances
     consumed = 0
-    for (instance_id, instance_type), vcpus in instance_id_to_budget_consumed.items():
-        if get_index_in_dict(instance_type) == index_in_dict:
+    for (instance_id, instance_type), vcpus in region.instance_id_to_budget_consumed.items():
+        if get_index_in_dict(instance_type, region.instance_type_prefixes_to_max_vcpus) == index_in_dict:
             consumed += vcpus
     
     available = max_budget - consumed
     return available
 
 
-def cleanup_terminated_instances(ec2, logging, stop_event):
+def cleanup_terminated_instances(ec2, logging, stop_event, region=DEFAULT_REGION_CONFIG):
     """
     Continuously check for terminated instances and free up their vCPU budget.
     Runs in a separate thread and sleeps every 2 seconds.
 
     Args:
-        ec2: boto3 EC2 client
+        ec2: boto3 EC2 client for the region
         logging: logger instance
         stop_event: threading.Event to signal when to stop
+        region: RegionConfig whose budget tracking to clean up
     """
-    logging.info("Starting cleanup thread - will run every 2 seconds")
+    logging.info(f"Starting cleanup thread for {region.region_name} - will run every 2 seconds")
 
     while not stop_event.is_set():
         try:
@@ -139,15 +189,15 @@ def cleanup_terminated_instances(ec2, logging, stop_event):
             # Find terminated instances (those in our tracking but not active)
             # instance_id_to_budget_consumed has (instance_id, instance_type) as keys
             terminated_instances = []
-            for (instance_id, instance_type), vcpus in instance_id_to_budget_consumed.items():
+            for (instance_id, instance_type), vcpus in list(region.instance_id_to_budget_consumed.items()):
                 if instance_id not in active_instance_ids:
                     terminated_instances.append((instance_id, instance_type, vcpus))
             logging.info(f"Found {len(terminated_instances)} terminated instances")
             # Remove terminated instances from tracking (budget will be recalculated automatically)
             freed_budget = 0
-            with locker_instance_type_prefixes_to_total_vcpus_budget:
+            with region.lock:
                 for instance_id, instance_type, vcpus in terminated_instances:
-                    del instance_id_to_budget_consumed[(instance_id, instance_type)]
+                    del region.instance_id_to_budget_consumed[(instance_id, instance_type)]
                     freed_budget += vcpus
                     logging.info(f"Freed {vcpus} vCPUs for terminated instance {instance_id}")
 
@@ -163,50 +213,54 @@ def cleanup_terminated_instances(ec2, logging, stop_event):
         # Sleep for 2 seconds before next cleanup cycle
         time.sleep(2)
 
-    logging.info("Cleanup thread stopped")
+    logging.info(f"Cleanup thread for {region.region_name} stopped")
 
 
 
-def process_instance_type(instance_type, ec2, s3, logging, exceptions_list, not_found_list):
-    """Process a single instance type in a separate thread"""
+def is_already_collected(ec2_instance_type, s3, logging):
+    """Return True if an earlier run already uploaded data for the instance type to S3"""
+    try:
+        response = s3.list_objects_v2(Bucket="suren-terraform", Prefix=f"pmu_data/{ec2_instance_type}")
+        return response["KeyCount"] > 0
+    except Exception as e:
+        logging.error(f"Error listing objects in S3: {e}")
+        traceback.print_exc()
+        return False
+
+
+def process_instance_type(instance_type, ec2, s3, logging, exceptions_list, not_found_list, region=DEFAULT_REGION_CONFIG):
+    """Process a single instance type in a separate thread, launching it in the given region"""
     total_cores = instance_type["VCpuInfo"]["DefaultVCpus"]
     ec2_instance_type = instance_type["InstanceType"]
-    index_in_dict = get_index_in_dict(instance_type["InstanceType"])
+    index_in_dict = get_index_in_dict(instance_type["InstanceType"], region.instance_type_prefixes_to_max_vcpus)
     try:
         architecture = instance_type["ProcessorInfo"]["SupportedArchitectures"][0]
-        if architecture == "arm64":
-            image_id = "ami-01b2110eef525172b"
-        elif architecture == "x86_64":
-            image_id = "ami-0bbdd8c17ed981ef9"
+        if architecture in region.image_ids:
+            image_id = region.image_ids[architecture]
         else:
             exceptions_list.append(f"Unsupported architecture: {architecture}")
             return None
-        try:
-            response =s3.list_objects_v2(Bucket="suren-terraform", Prefix=f"pmu_data/{ec2_instance_type}")
-            if response["KeyCount"] > 0:
-                logging.info(f"Instance {ec2_instance_type} already exists")
-                return None
-        except Exception as e:
-            logging.error(f"Error listing objects in S3: {e}")
-            traceback.print_exc()
-        logging.info(f"Running instance {ec2_instance_type} with image {image_id}")
+        if is_already_collected(ec2_instance_type, s3, logging):
+            logging.info(f"Instance {ec2_instance_type} already exists")
+            return None
+        logging.info(f"Running instance {ec2_instance_type} with image {image_id} in {region.region_name}")
         assert index_in_dict is not None
         while index_in_dict is not None:
             logging.info(f"Waiting for {ec2_instance_type} to be available")
-            with locker_instance_type_prefixes_to_total_vcpus_budget:
-                max_budget = INSTANCE_TYPE_PREFIXES_TO_MAX_VCPUS[index_in_dict]
+            with region.lock:
+                max_budget = region.instance_type_prefixes_to_max_vcpus[index_in_dict]
                 if max_budget < total_cores:
                     logging.error(f"Not enough budget available for {ec2_instance_type}")
                     break
-                available_budget = calculate_available_budget(index_in_dict)
+                available_budget = calculate_available_budget(index_in_dict, region)
                 logging.info(f"Available budget for {ec2_instance_type}: {available_budget} vCPUs (need {total_cores})")
-                logging.info(f"Current consumption: {instance_id_to_budget_consumed}")
+                logging.info(f"Current consumption: {region.instance_id_to_budget_consumed}")
                 if available_budget >= total_cores:
                     logging.info(f"Sufficient budget available, proceeding with instance launch")
                 else:
                     time.sleep(1)
                     continue
-                for subnet_id in subnet_ids:
+                for subnet_id in region.subnet_ids:
                     logging.info(f"Launching instance {ec2_instance_type} in subnet {subnet_id}")
                     try:
                         response = ec2.run_instances(
@@ -224,9 +278,9 @@ def process_instance_type(instance_type, ec2, s3, logging, exceptions_list, not_
                                 },
                             ],
                             InstanceType=ec2_instance_type,
-                            KeyName="pmu-events-info-key",
+                            KeyName=region.key_name,
                             SubnetId=subnet_id,
-                            SecurityGroupIds=["sg-0d7ddef649615c1ce"],
+                            SecurityGroupIds=[region.security_group_id],
                             MinCount=1,
                             MaxCount=1,
                             IamInstanceProfile={"Name": "pmu-events-info-ec2-s3-profile"},
@@ -244,7 +298,7 @@ def process_instance_type(instance_type, ec2, s3, logging, exceptions_list, not_
                             UserData=base64.b64encode(open("user_data.sh", "rb").read()).decode("utf-8"),
                             InstanceInitiatedShutdownBehavior="terminate",
                         )
-                        instance_id_to_budget_consumed[(response["Instances"][0]["InstanceId"], ec2_instance_type)] = total_cores
+                        region.instance_id_to_budget_consumed[(response["Instances"][0]["InstanceId"], ec2_instance_type)] = total_cores
                         return response
                     except Exception as e:
                         logging.error(f"Error launching instance {ec2_instance_type} in subnet {subnet_id}: {e}")
@@ -269,9 +323,8 @@ def process_instance_type(instance_type, ec2, s3, logging, exceptions_list, not_
         logging.error(f"Error running instance {ec2_instance_type}: {e}")
         return None
 
-def main():
-    ec2 = boto3.client("ec2", region_name="us-east-1")
-    s3 = boto3.client("s3", region_name="us-east-1")
+def describe_all_instance_types(ec2):
+    """Return every instance type offered in the EC2 client's region, sorted by name"""
     # get all instance types. paginated.
     instance_types = []
     next_token = None
@@ -285,30 +338,138 @@ def main():
         if not next_token:
             break
     instance_types.sort(key=lambda x: x["InstanceType"])
-    instance_types = instance_types
+    return instance_types
+
+
+def assign_instance_types_to_regions(region_to_instance_types, regions, not_found_list):
+    """
+    Assign each instance type to exactly one region that offers it.
+
+    The instance type goes to the region where its prefix group would be the
+    least loaded relative to that region's vCPU quota, which spreads the sweep
+    across regional quotas. Ties go to the region listed first, so list the
+    cheapest region first. Only regions with an AMI for the instance type's
+    architecture are considered. Instance types that fit no region are
+    appended to not_found_list instead of being assigned.
+
+    Args:
+        region_to_instance_types: region name -> describe_instance_types entries offered there
+        regions: list of RegionConfig in order of preference
+        not_found_list: list collecting instance types that cannot be launched anywhere
+
+    Returns:
+        region name -> list of instance type entries to launch in that region
+    """
+    instance_type_to_offers = OrderedDict()
+    for region in regions:
+        for instance_type in region_to_instance_types.get(region.region_name, []):
+            instance_type_to_offers.setdefault(instance_type["InstanceType"], []).append((region, instance_type))
+
+    region_to_assigned = {region.region_name: [] for region in regions}
+    region_to_assigned_vcpus = {region.region_name: {} for region in regions}
+    for ec2_instance_type in sorted(instance_type_to_offers):
+        offers = instance_type_to_offers[ec2_instance_type]
+        best_region, best_instance_type, best_load = None, None, None
+        for region, instance_type in offers:
+            architecture = instance_type["ProcessorInfo"]["SupportedArchitectures"][0]
+            if architecture not in region.image_ids:
+                continue
+            total_cores = instance_type["VCpuInfo"]["DefaultVCpus"]
+            index_in_dict = get_index_in_dict(ec2_instance_type, region.instance_type_prefixes_to_max_vcpus)
+            max_budget = region.instance_type_prefixes_to_max_vcpus.get(index_in_dict, 0)
+            if max_budget < total_cores:
+                continue
+            load = (region_to_assigned_vcpus[region.region_name].get(index_in_dict, 0) + total_cores) / max_budget
+            if best_load is None or load < best_load:
+                best_region, best_instance_type, best_load = region, instance_type, load
+        if best_region is None:
+            logging.error(f"No region has the budget and an AMI for {ec2_instance_type}")
+            not_found_list.append(ec2_instance_type)
+            continue
+
+        index_in_dict = get_index_in_dict(ec2_instance_type, best_region.instance_type_prefixes_to_max_vcpus)
+        assigned_vcpus = region_to_assigned_vcpus[best_region.region_name]
+        assigned_vcpus[index_in_dict] = assigned_vcpus.get(index_in_dict, 0) + best_instance_type["VCpuInfo"]["DefaultVCpus"]
+        region_to_assigned[best_region.region_name].append(best_instance_type)
+    return region_to_assigned
+
+
+def main(regions=REGION_CONFIGS, s3_endpoint_url=None):
+    region_names = [region.region_name for region in regions]
+    if len(set(region_names)) != len(region_names):
+        raise ValueError(f"Duplicate region names in region configs: {region_names}")
+    s3 = boto3.client("s3", region_name="us-east-1", endpoint_url=s3_endpoint_url)
+    region_name_to_ec2 = {}
+    region_to_instance_types = {}
+    reachable_regions = []
+    for region in regions:
+        # A region that is not enabled or not reachable should not stop the others.
+        try:
+            ec2 = boto3.client("ec2", region_name=region.region_name, endpoint_url=region.endpoint_url)
+            instance_types = describe_all_instance_types(ec2)
+        except Exception as e:
+            logging.error(f"Skipping region {region.region_name}, could not describe instance types: {e}")
+            traceback.print_exc()
+            continue
+        region_name_to_ec2[region.region_name] = ec2
+        region_to_instance_types[region.region_name] = instance_types
+        reachable_regions.append(region)
+    regions = reachable_regions
+
+    # Drop types collected by an earlier run so they don't count as load.
+    offered_instance_types = set()
+    for instance_types in region_to_instance_types.values():
+        offered_instance_types.update(x["InstanceType"] for x in instance_types)
+    collected_instance_types = set()
+    for ec2_instance_type in sorted(offered_instance_types):
+        if is_already_collected(ec2_instance_type, s3, logging):
+            collected_instance_types.add(ec2_instance_type)
+    logging.info(f"Skipping {len(collected_instance_types)} instance types already in S3")
+    for region_name, instance_types in region_to_instance_types.items():
+        region_to_instance_types[region_name] = [x for x in instance_types if x["InstanceType"] not in collected_instance_types]
 
     # Thread-safe collections for results
     exceptions = []
     not_found_instance_types = []
 
-    # Start cleanup thread to run every 2 seconds
+    region_to_assigned = assign_instance_types_to_regions(region_to_instance_types, regions, not_found_instance_types)
+    for region in regions:
+        logging.info(f"Assigned {len(region_to_assigned[region.region_name])} instance types to {region.region_name}")
+
+    # Start a cleanup thread per region to run every 2 seconds
     stop_cleanup_event = threading.Event()
-    cleanup_thread = threading.Thread(
-        target=cleanup_terminated_instances,
-        args=(ec2, logging, stop_cleanup_event),
-        daemon=True
-    )
-    cleanup_thread.start()
-    logging.info("Started cleanup thread")
-
- 
-    # Use ThreadPoolExecutor for parallel execution
-    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-        # Submit all tasks
-        future_to_instance = {
-            executor.submit(process_instance_type, instance_type, ec2, s3, logging, exceptions, not_found_instance_types): instance_type
-            for instance_type in instance_types
-        }
+    cleanup_threads = []
+    for region in regions:
+        cleanup_thread = threading.Thread(
+            target=cleanup_terminated_instances,
+            args=(region_name_to_ec2[region.region_name], logging, stop_cleanup_event, region),
+            name=f"cleanup-{region.region_name}",
+            daemon=True
+        )
+        cleanup_thread.start()
+        cleanup_threads.append(cleanup_thread)
+    logging.info(f"Started {len(cleanup_threads)} cleanup threads")
+
+    # Use a ThreadPoolExecutor per region so each region's quota is worked in parallel
+    executors = []
+    future_to_instance = {}
+    try:
+        for region in regions:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=region.max_workers)
+            executors.append(executor)
+            # Submit all tasks
+            for instance_type in region_to_assigned[region.region_name]:
+                future = executor.submit(
+                    process_instance_type,
+                    instance_type,
+                    region_name_to_ec2[region.region_name],
+                    s3,
+                    logging,
+                    exceptions,
+                    not_found_instance_types,
+                    region,
+                )
+                future_to_instance[future] = instance_type
 
         # Collect results as they complete
         for future in concurrent.futures.as_completed(future_to_instance):
@@ -320,11 +481,15 @@ def main():
             except Exception as exc:
                 traceback.print_exc()
                 logging.error(f'{instance_type} generated an exception: {exc}')
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=True)
 
-    # Stop the cleanup thread
-    logging.info("Stopping cleanup thread...")
+    # Stop the cleanup threads
+    logging.info("Stopping cleanup threads...")
     stop_cleanup_event.set()
-    cleanup_thread.join(timeout=5)  # Wait up to 5 seconds for cleanup thread to stop
+    for cleanup_thread in cleanup_threads:
+        cleanup_thread.join(timeout=5)  # Wait up to 5 seconds for each cleanup thread to stop
 
     # Handle exceptions and not found instances
     for exception in exceptions:
@@ -1,5 +1,19 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, UTC
+
 import pytest
-from launch_instances_and_collect_data import InstanceType
+import launch_instances_and_collect_data
+from launch_instances_and_collect_data import (
+    InstanceType,
+    RegionConfig,
+    assign_instance_types_to_regions,
+    calculate_available_budget,
+    cleanup_terminated_instances,
+    main,
+    process_instance_type,
+)
 
 
 
@@ -26,5 +40,260 @@ def test_instance_type():
     assert instance_type_obj.instance_size == "56xlarge"
 
 
+def make_region(region_name, max_vcpus=16):
+    instance_type_prefixes_to_max_vcpus = OrderedDict()
+    instance_type_prefixes_to_max_vcpus[('c', 'm')] = max_vcpus
+    return RegionConfig(
+        region_name=region_name,
+        subnet_ids=[f"subnet-{region_name}-a", f"subnet-{region_name}-b"],
+        security_group_id=f"sg-{region_name}",
+        image_ids={"x86_64": f"ami-{region_name}-x86", "arm64": f"ami-{region_name}-arm"},
+        instance_type_prefixes_to_max_vcpus=instance_type_prefixes_to_max_vcpus,
+    )
+
+
+def make_instance_type(name, vcpus, architecture="x86_64"):
+    return {
+        "InstanceType": name,
+        "VCpuInfo": {"DefaultVCpus": vcpus},
+        "ProcessorInfo": {"SupportedArchitectures": [architecture]},
+    }
+
+
+@pytest.fixture
+def in_tmp_path(tmp_path, monkeypatch):
+    """Run from a scratch directory with a stub user_data.sh, since the launcher uses relative paths"""
+    (tmp_path / "user_data.sh").write_text("#!/bin/bash\n")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Skip the cleanup loop's real sleeps between cycles"""
+    monkeypatch.setattr(launch_instances_and_collect_data.time, "sleep", lambda seconds: None)
+
+
+class FakeEC2:
+    """Local stand-in for the EC2 client calls the launcher makes"""
+
+    def __init__(self, unsupported_subnets=(), instance_types=(), describe_instance_types_error=None):
+        self.unsupported_subnets = set(unsupported_subnets)
+        self.instance_types = list(instance_types)
+        self.describe_instance_types_error = describe_instance_types_error
+        self.run_instances_calls = []
+        self.active_instance_ids = set()
+
+    def describe_instance_types(self, **kwargs):
+        if self.describe_instance_types_error:
+            raise self.describe_instance_types_error
+        return {"InstanceTypes": self.instance_types}
+
+    def terminate_instances(self, InstanceIds):
+        self.active_instance_ids.difference_update(InstanceIds)
+
+    def run_instances(self, **kwargs):
+        if kwargs["SubnetId"] in self.unsupported_subnets:
+            raise Exception("Unsupported: instance type not offered in this availability zone")
+        self.run_instances_calls.append(kwargs)
+        instance_id = f"i-{len(self.run_instances_calls)}"
+        self.active_instance_ids.add(instance_id)
+        return {"Instances": [{"InstanceId": instance_id}]}
+
+    def describe_instances(self, **kwargs):
+        return {"Reservations": [{"Instances": [
+            {"InstanceId": instance_id, "LaunchTime": datetime.now(UTC), "State": {"Name": "pending"}}
+            for instance_id in list(self.active_instance_ids)
+        ]}]}
+
+
+class FakeS3:
+    """Local stand-in for S3 holding data for the given instance types"""
+
+    def __init__(self, collected_instance_types=()):
+        self.collected_instance_types = set(collected_instance_types)
+
+    def list_objects_v2(self, Bucket, Prefix):
+        return {"KeyCount": int(Prefix.removeprefix("pmu_data/") in self.collected_instance_types)}
+
+
+def test_assign_instance_types_to_regions():
+    us_east_1 = make_region("us-east-1")
+    us_west_2 = make_region("us-west-2")
+    region_to_instance_types = {
+        "us-east-1": [make_instance_type("c5.2xlarge", 8), make_instance_type("m5.2xlarge", 8), make_instance_type("c5.large", 2)],
+        "us-west-2": [make_instance_type("c5.2xlarge", 8), make_instance_type("m5.2xlarge", 8), make_instance_type("m7g.large", 2, "arm64")],
+    }
+
+    not_found = []
+    region_to_assigned = assign_instance_types_to_regions(region_to_instance_types, [us_east_1, us_west_2], not_found)
+
+    # c5.2xlarge ties and goes to the first region, m5.2xlarge then balances to
+    # us-west-2, and types offered in only one region stay there.
+    assert [x["InstanceType"] for x in region_to_assigned["us-east-1"]] == ["c5.2xlarge", "c5.large"]
+    assert [x["InstanceType"] for x in region_to_assigned["us-west-2"]] == ["m5.2xlarge", "m7g.large"]
+    assert not_found == []
+
+
+def test_assign_instance_types_to_regions_skips_regions_without_quota():
+    small = make_region("us-east-1", max_vcpus=4)
+    large = make_region("us-west-2", max_vcpus=64)
+    region_to_instance_types = {
+        "us-east-1": [make_instance_type("c5.4xlarge", 16), make_instance_type("x1.16xlarge", 64)],
+        "us-west-2": [make_instance_type("c5.4xlarge", 16)],
+    }
+
+    not_found = []
+    region_to_assigned = assign_instance_types_to_regions(region_to_instance_types, [small, large], not_found)
+
+    assert [x["InstanceType"] for x in region_to_assigned["us-west-2"]] == ["c5.4xlarge"]
+    # No region has quota for x1, so it is reported instead of taking a worker slot.
+    assert region_to_assigned["us-east-1"] == []
+    assert not_found == ["x1.16xlarge"]
+
+
+def test_assign_instance_types_to_regions_skips_regions_without_ami():
+    us_east_1 = make_region("us-east-1")
+    us_west_2 = make_region("us-west-2")
+    del us_west_2.image_ids["arm64"]
+    region_to_instance_types = {
+        "us-east-1": [make_instance_type("c5.4xlarge", 16), make_instance_type("m7g.large", 2, "arm64")],
+        "us-west-2": [make_instance_type("m7g.large", 2, "arm64"), make_instance_type("c7g.large", 2, "arm64")],
+    }
+
+    not_found = []
+    region_to_assigned = assign_instance_types_to_regions(region_to_instance_types, [us_east_1, us_west_2], not_found)
+
+    # us-west-2 is less loaded but has no arm64 AMI.
+    assert [x["InstanceType"] for x in region_to_assigned["us-east-1"]] == ["c5.4xlarge", "m7g.large"]
+    assert region_to_assigned["us-west-2"] == []
+    assert not_found == ["c7g.large"]
+
+
+def test_process_instance_type_uses_region_config(in_tmp_path):
+    us_east_1 = make_region("us-east-1")
+    us_west_2 = make_region("us-west-2")
+    ec2 = FakeEC2(unsupported_subnets=["subnet-us-west-2-a"])
+    exceptions, not_found = [], []
+
+    response = process_instance_type(
+        make_instance_type("m7g.large", 2, "arm64"), ec2, FakeS3(), logging, exceptions, not_found, us_west_2
+    )
+
+    assert response["Instances"][0]["InstanceId"] == "i-1"
+    (call,) = ec2.run_instances_calls
+    assert call["ImageId"] == "ami-us-west-2-arm"
+    assert call["SubnetId"] == "subnet-us-west-2-b"
+    assert call["SecurityGroupIds"] == ["sg-us-west-2"]
+    assert us_west_2.instance_id_to_budget_consumed == {("i-1", "m7g.large"): 2}
+    assert calculate_available_budget(('c', 'm'), us_west_2) == 14
+    # Budgets are tracked per region.
+    assert us_east_1.instance_id_to_budget_consumed == {}
+    assert calculate_available_budget(('c', 'm'), us_east_1) == 16
+    assert exceptions == [] and not_found == []
+
+
+def test_cleanup_terminated_instances_frees_region_budget(no_sleep):
+    region = make_region("us-west-2")
+    ec2 = FakeEC2()
+    ec2.active_instance_ids.add("i-running")
+    region.instance_id_to_budget_consumed[("i-running", "c5.large")] = 2
+    region.instance_id_to_budget_consumed[("i-gone", "c5.2xlarge")] = 8
+
+    stop_event = threading.Event()
+    describe_instances = ec2.describe_instances
+
+    def describe_instances_once(**kwargs):
+        # Stop after a single cleanup cycle.
+        stop_event.set()
+        return describe_instances(**kwargs)
+
+    ec2.describe_instances = describe_instances_once
+    cleanup_terminated_instances(ec2, logging, stop_event, region)
+
+    assert region.instance_id_to_budget_consumed == {("i-running", "c5.large"): 2}
+
+
+def test_main_sweeps_each_region_with_its_own_client(in_tmp_path, no_sleep, monkeypatch):
+    us_east_1 = make_region("us-east-1")
+    us_east_1.endpoint_url = "http://localhost:5000"
+    us_west_2 = make_region("us-west-2")
+    us_west_2.endpoint_url = "http://localhost:5001"
+    region_name_to_ec2 = {
+        "us-east-1": FakeEC2(instance_types=[
+            make_instance_type("c5.large", 2),
+            make_instance_type("c5.xlarge", 4),
+            make_instance_type("m5.large", 2),
+            make_instance_type("c5.24xlarge", 96),
+        ]),
+        "us-west-2": FakeEC2(instance_types=[
+            make_instance_type("c5.large", 2),
+            make_instance_type("m5.large", 2),
+            make_instance_type("m7g.large", 2, "arm64"),
+        ]),
+    }
+    client_calls = []
+
+    def fake_client(service_name, region_name, endpoint_url=None):
+        client_calls.append((service_name, region_name, endpoint_url))
+        if service_name == "s3":
+            return FakeS3()
+        return region_name_to_ec2[region_name]
+
+    monkeypatch.setattr(launch_instances_and_collect_data.boto3, "client", fake_client)
+
+    main(regions=[us_east_1, us_west_2], s3_endpoint_url="http://localhost:5002")
+
+    assert client_calls == [
+        ("s3", "us-east-1", "http://localhost:5002"),
+        ("ec2", "us-east-1", "http://localhost:5000"),
+        ("ec2", "us-west-2", "http://localhost:5001"),
+    ]
+    for region in [us_east_1, us_west_2]:
+        for call in region_name_to_ec2[region.region_name].run_instances_calls:
+            assert call["SubnetId"] == region.subnet_ids[0]
+            assert call["SecurityGroupIds"] == [region.security_group_id]
+            assert call["ImageId"] in region.image_ids.values()
+    east_launched = [call["InstanceType"] for call in region_name_to_ec2["us-east-1"].run_instances_calls]
+    west_launched = [call["InstanceType"] for call in region_name_to_ec2["us-west-2"].run_instances_calls]
+    # Each type is launched exactly once, spread across both regions.
+    assert sorted(east_launched + west_launched) == ["c5.large", "c5.xlarge", "m5.large", "m7g.large"]
+    assert sorted(east_launched) == ["c5.large", "c5.xlarge"]
+    assert sorted(west_launched) == ["m5.large", "m7g.large"]
+    assert (in_tmp_path / "not_found_instance_types.txt").read_text() == "c5.24xlarge\n"
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("cleanup-")]
+
+
+def test_main_skips_failing_regions_and_collected_types(in_tmp_path, no_sleep, monkeypatch):
+    us_east_1 = make_region("us-east-1")
+    us_west_2 = make_region("us-west-2")
+    region_name_to_ec2 = {
+        "us-east-1": FakeEC2(describe_instance_types_error=Exception("OptInRequired")),
+        "us-west-2": FakeEC2(instance_types=[make_instance_type("c5.large", 2), make_instance_type("m5.large", 2)]),
+    }
+    s3 = FakeS3(collected_instance_types=["c5.large"])
+
+    def fake_client(service_name, region_name, endpoint_url=None):
+        if service_name == "s3":
+            return s3
+        return region_name_to_ec2[region_name]
+
+    monkeypatch.setattr(launch_instances_and_collect_data.boto3, "client", fake_client)
+
+    main(regions=[us_east_1, us_west_2])
+
+    assert region_name_to_ec2["us-east-1"].run_instances_calls == []
+    assert [call["InstanceType"] for call in region_name_to_ec2["us-west-2"].run_instances_calls] == ["m5.large"]
+    assert (in_tmp_path / "not_found_instance_types.txt").read_text() == ""
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("cleanup-")]
+
+
+def test_main_rejects_duplicate_region_names(monkeypatch):
+    monkeypatch.setattr(launch_instances_and_collect_data.boto3, "client", lambda *args, **kwargs: pytest.fail())
+
+    with pytest.raises(ValueError, match="Duplicate region names"):
+        main(regions=[make_region("us-east-1"), make_region("us-east-1")])
+
+
 if __name__ == "__main__":
     pytest.main()